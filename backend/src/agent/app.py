@@ -17,9 +17,14 @@
 # - 开发环境：前后端分离，前端由Vite开发服务器提供
 
 # mypy: disable - error - code = "no-untyped-def,misc"
-import pathlib
+import gzip
+import hashlib
+import mimetypes
+import os
+import brotli
 from fastapi import FastAPI, Response
-from fastapi.staticfiles import StaticFiles
+from starlette.responses import FileResponse
+from starlette.routing import Route
 
 # 创建FastAPI应用实例
 # FastAPI是现代、快速的Python Web框架，支持：
@@ -29,6 +34,189 @@ from fastapi.staticfiles import StaticFiles
 # - WebSocket支持（LangGraph需要）
 app = FastAPI()
 
+# 前端资源的缓存策略
+# - assets/ 下的文件名带有内容哈希（Vite构建产物），内容变化文件名就变化，
+#   可以让浏览器缓存一年且无需重新验证
+# - index.html 等入口文件名固定，必须每次向服务器验证（配合ETag返回304）
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def _cache_control_for(rel_path):
+    """
+    根据文件路径选择Cache-Control策略
+
+    Args:
+        rel_path: 相对于构建目录的文件路径
+
+    Returns:
+        str: Cache-Control响应头的值
+    """
+    if rel_path.startswith("assets/"):
+        return IMMUTABLE_CACHE_CONTROL
+    return REVALIDATE_CACHE_CONTROL
+
+
+# 预压缩配置
+# 只压缩文本类资源，太小的文件压缩收益很低，直接原样返回
+COMPRESSIBLE_MEDIA_TYPES = (
+    "text/",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+)
+MIN_COMPRESS_SIZE = 1024
+
+# 超过这个大小的文件不读入内存，而是在启动时缓存stat结果，
+# 请求时用FileResponse从磁盘流式发送（不再逐请求stat）
+MAX_IN_MEMORY_SIZE = 4 * 1024 * 1024
+
+# 内容编码的优先级：br > gzip > identity（不压缩）
+# ETag后缀用于区分同一文件不同编码的版本
+ENCODING_ETAG_SUFFIXES = {"br": "-br", "gzip": "-gz"}
+
+
+def _pick_encoding(accept_encoding, entry):
+    """
+    根据Accept-Encoding选择要返回的预压缩版本
+
+    Args:
+        accept_encoding: 请求头Accept-Encoding的值，例如 "gzip, deflate, br"
+        entry: 缓存中的文件条目
+
+    Returns:
+        str: "br"、"gzip" 或 "identity"
+    """
+    accepted = set()
+    for token in accept_encoding.split(","):
+        coding, _, params = token.partition(";")
+        params = params.strip()
+        # 显式声明 q=0 表示客户端拒绝该编码
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+
+    for encoding in ENCODING_ETAG_SUFFIXES:
+        if encoding in entry and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def _etag_matches(if_none_match, etag):
+    """
+    判断客户端的If-None-Match是否命中当前ETag
+
+    支持 "*"、逗号分隔的多个ETag以及弱校验前缀 W/。
+
+    Args:
+        if_none_match: 请求头If-None-Match的值
+        etag: 当前文件的ETag
+
+    Returns:
+        bool: 命中时返回True，此时可以直接返回304
+    """
+    if if_none_match.strip() == "*":
+        return True
+    etag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def _iter_files(root):
+    """
+    递归列出目录下的所有文件
+
+    Args:
+        root: 要遍历的目录
+
+    Yields:
+        str: 每个文件的完整路径
+    """
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            yield os.path.join(dirpath, filename)
+
+
+def _load_frontend_cache(build_path):
+    """
+    一次性把前端构建产物读入内存
+
+    React的dist/目录很小（几MB），并且在一次部署中是不可变的，
+    所以在启动时读取一次，之后每个请求都直接从内存返回，
+    省去每次请求的 stat() + open() + read() 系统调用。
+
+    文本类资源同时预压缩出gzip（以及可选的br）版本，
+    请求时按Accept-Encoding直接返回对应的字节，不再逐请求压缩。
+
+    超过 MAX_IN_MEMORY_SIZE 的大文件不读入内存，只缓存路径和stat结果，
+    请求时交给FileResponse流式发送，同样不需要再stat。
+
+    Args:
+        build_path: 前端构建目录的绝对路径
+
+    Returns:
+        dict: {相对路径: 文件条目}
+              相对路径使用"/"分隔，例如 "assets/index-abc123.js"
+              文件条目结构：
+              {
+                  "type": MIME类型,
+                  "cache_control": Cache-Control值,
+                  "identity": (原始内容, ETag),
+                  "gzip": (gzip内容, ETag),   # 可选
+                  "br": (brotli内容, ETag),   # 可选，压缩后更小时才有
+                  "file": (文件路径, stat结果, ETag),  # 仅大文件，替代以上三项
+              }
+    """
+    cache = {}
+    for file_path in _iter_files(build_path):
+        rel_path = os.path.relpath(file_path, build_path).replace(os.sep, "/")
+        media_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        stat_result = os.stat(file_path)
+
+        # 大文件：只缓存stat结果，ETag由大小和修改时间生成，避免读取整个文件
+        if stat_result.st_size > MAX_IN_MEMORY_SIZE:
+            etag = f'W/"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+            cache[rel_path] = {
+                "type": media_type,
+                "cache_control": _cache_control_for(rel_path),
+                "file": (file_path, stat_result, etag),
+            }
+            continue
+
+        with open(file_path, "rb") as f:
+            blob = f.read()
+        # ETag基于文件内容计算，内容不变ETag就不变；只在启动时计算一次
+        digest = hashlib.blake2b(blob, digest_size=8).hexdigest()
+
+        entry = {
+            "type": media_type,
+            "cache_control": _cache_control_for(rel_path),
+            "identity": (blob, f'"{digest}"'),
+        }
+
+        # 对文本类资源预压缩，只保留确实变小了的版本
+        if len(blob) >= MIN_COMPRESS_SIZE and media_type.startswith(
+            COMPRESSIBLE_MEDIA_TYPES
+        ):
+            # 同时预压缩gzip和brotli两份，按客户端的Accept-Encoding选择
+            compressed = {
+                "gzip": gzip.compress(blob, compresslevel=9),
+                "br": brotli.compress(blob, quality=11),
+            }
+            for encoding, encoded in compressed.items():
+                if len(encoded) < len(blob):
+                    suffix = ENCODING_ETAG_SUFFIXES[encoding]
+                    entry[encoding] = (encoded, f'"{digest}{suffix}"')
+
+        cache[rel_path] = entry
+    return cache
+
 
 def create_frontend_router(build_dir="../frontend/dist"):
     """
@@ -41,16 +229,16 @@ def create_frontend_router(build_dir="../frontend/dist"):
     4. 支持单页应用（SPA）的路由回退
     
     工作原理：
-    - 正常情况：使用StaticFiles服务React构建产物
+    - 正常情况：启动时把React构建产物读入内存，请求直接从内存返回
     - 构建缺失：返回友好的错误信息
-    - HTML模式：支持客户端路由（React Router）
+    - SPA回退：未知路径返回index.html，支持客户端路由（React Router）
     
     Args:
         build_dir: React构建目录的相对路径，默认为"../frontend/dist"
                   这个路径相对于当前文件（app.py）
     
     Returns:
-        StaticFiles实例或Route实例，用于处理前端请求
+        Route实例，用于处理前端请求
         
     文件结构说明：
     ```
@@ -63,13 +251,18 @@ def create_frontend_router(build_dir="../frontend/dist"):
     ```
     """
     # 计算前端构建目录的绝对路径
-    # pathlib.Path(__file__).parent = backend/src/agent/
-    # parent.parent.parent = 项目根目录
-    # / build_dir = frontend/dist/
-    build_path = pathlib.Path(__file__).parent.parent.parent / build_dir
+    # 使用os.path字符串操作，比创建多个pathlib.Path对象更轻量
+    # os.path.dirname(__file__) = backend/src/agent/
+    # 向上两级 = backend/
+    # + build_dir = frontend/dist/
+    build_path = os.path.normpath(
+        os.path.join(os.path.dirname(__file__), "..", "..", build_dir)
+    )
 
     # 检查构建目录和关键文件是否存在
-    if not build_path.is_dir() or not (build_path / "index.html").is_file():
+    if not os.path.isdir(build_path) or not os.path.isfile(
+        os.path.join(build_path, "index.html")
+    ):
         # 构建不存在或不完整的处理逻辑
         print(
             f"WARN: Frontend build directory not found or incomplete at {build_path}. "
@@ -78,8 +271,6 @@ def create_frontend_router(build_dir="../frontend/dist"):
         
         # 创建一个临时路由，返回构建缺失的错误信息
         # 这在开发环境或构建失败时很有用
-        from starlette.routing import Route
-
         async def dummy_frontend(request):
             """
             临时前端处理器：当构建缺失时返回错误信息
@@ -99,13 +290,61 @@ def create_frontend_router(build_dir="../frontend/dist"):
         # 返回通配符路由，捕获所有前端路径
         return Route("/{path:path}", endpoint=dummy_frontend)
 
-    # 正常情况：返回静态文件服务器
-    # StaticFiles特性：
-    # - directory: 静态文件目录
-    # - html: 启用HTML模式，支持SPA路由
-    #   当请求的文件不存在时，返回index.html
-    #   这样React Router可以处理客户端路由
-    return StaticFiles(directory=build_path, html=True)
+    # 正常情况：从内存缓存中服务静态文件
+    # 构建产物只在这里读取一次，之后的请求不再访问文件系统
+    frontend_cache = _load_frontend_cache(build_path)
+    index_entry = frontend_cache["index.html"]
+
+    async def serve_frontend(request):
+        """
+        前端处理器：从内存缓存返回静态文件
+
+        当请求的文件不存在时返回index.html，
+        这样React Router可以处理客户端路由。
+        如果客户端缓存的ETag仍然有效，直接返回不带内容的304。
+        客户端支持压缩时返回启动时预压缩好的版本。
+
+        Args:
+            request: Starlette请求对象
+
+        Returns:
+            Response: 包含文件内容的200响应，或者只有响应头的304响应
+        """
+        entry = frontend_cache.get(request.path_params["path"], index_entry)
+
+        # 大文件：使用启动时缓存的stat结果，由FileResponse流式发送
+        if "file" in entry:
+            path, stat_result, etag = entry["file"]
+            headers = {"ETag": etag, "Cache-Control": entry["cache_control"]}
+            if_none_match = request.headers.get("if-none-match")
+            if if_none_match and _etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=headers)
+            return FileResponse(
+                path,
+                media_type=entry["type"],
+                headers=headers,
+                stat_result=stat_result,
+            )
+
+        encoding = _pick_encoding(request.headers.get("accept-encoding", ""), entry)
+        blob, etag = entry[encoding]
+
+        headers = {"ETag": etag, "Cache-Control": entry["cache_control"]}
+        if "gzip" in entry or "br" in entry:
+            # 存在压缩版本时，响应内容取决于Accept-Encoding，需要告知缓存代理
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+
+        # 条件请求：客户端缓存仍然有效时不再发送文件内容
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+
+        return Response(blob, media_type=entry["type"], headers=headers)
+
+    # 返回通配符路由，捕获所有前端路径
+    return Route("/{path:path}", endpoint=serve_frontend)
 
 
 # ========== 应用配置和路由挂载 ==========
@@ -141,7 +380,7 @@ app.mount(
 #      * 后端：其他API路径
 #
 # 2. 路由策略：
-#    - 静态资源：直接文件服务
+#    - 静态资源：启动时读入内存，直接从内存服务（大文件缓存stat后流式发送）
 #    - SPA路由：回退到index.html
 #    - API请求：LangGraph处理
 #    - 文档：FastAPI自动生成
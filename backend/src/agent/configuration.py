@@ -15,8 +15,10 @@
 # - 支持环境变量和运行时配置
 # - 包含详细的元数据说明
 
+import functools
 import os
-from pydantic import BaseModel, Field
+from collections.abc import Hashable
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Any, Optional
 
 from langchain_core.runnables import RunnableConfig
@@ -38,8 +40,13 @@ class Configuration(BaseModel):
     - 前端用户可以选择不同的"努力程度"影响搜索深度
     - 开发者可以通过环境变量调整模型选择
     - 不同部署环境可以有不同的默认配置
+    
+    注意：实例是只读的（frozen）。相同的配置会返回同一个缓存实例，
+         被所有调用方共享，修改它会影响其他调用方。
     """
 
+    model_config = ConfigDict(frozen=True)
+
     # ========== AI 模型配置 ==========
     
     query_generator_model: str = Field(
@@ -151,6 +158,28 @@ class Configuration(BaseModel):
     安全机制：即使AI认为信息不足，达到最大循环次数也会强制结束
     """
 
+    enable_search_cache: bool = Field(
+        default=True,
+        metadata={"description": "是否在进程内缓存网络搜索结果。相同的查询（忽略大小写和首尾空格）在同一天内直接复用之前的结果。"},
+    )
+    """
+    搜索结果缓存开关
+    
+    作用：避免重复执行相同的Google搜索
+    
+    缓存规则：
+    - 缓存键：(模型, 规范化后的查询, 当前日期)
+    - 进程内LRU缓存，最多保留最近的256条结果
+    - 日期变化后自动失效，保证时效性
+    
+    使用场景：
+    - 反思阶段生成的补充查询经常与之前的查询重复
+    - 多个用户研究相同主题时可以共享结果
+    
+    影响：命中缓存的查询几乎没有延迟，也不消耗API配额；
+         需要每次都获取最新搜索结果时可以关闭
+    """
+
     @classmethod
     def from_runnable_config(
         cls, config: Optional[RunnableConfig] = None
@@ -193,20 +222,49 @@ class Configuration(BaseModel):
 
         # 获取原始配置值
         # 为每个配置字段尝试从环境变量或运行时配置中获取值
+        # 每次调用都读取 os.environ：graph.py 在导入本模块之后才调用 load_dotenv()，
+        # 导入时的快照会丢失 .env 中的配置
+        field_names = _FIELD_NAMES if cls is Configuration else tuple(cls.model_fields.keys())
         raw_values: dict[str, Any] = {
             name: os.environ.get(name.upper(), configurable.get(name))
-            for name in cls.model_fields.keys()
+            for name in field_names
         }
 
         # 过滤掉空值
         # None值会使用类定义中的默认值
         values = {k: v for k, v in raw_values.items() if v is not None}
 
+        # 配置值都可哈希时走缓存，相同的配置只构造一次Pydantic实例
+        # 一次研究流程中每个节点都会调用本方法，而配置通常完全相同
+        if cls is Configuration and all(
+            isinstance(v, Hashable) for v in values.values()
+        ):
+            return _build_configuration(tuple(sorted(values.items())))
+
         # 创建配置实例
         # Pydantic会自动验证类型和应用默认值
         return cls(**values)
 
 
+@functools.lru_cache(maxsize=128)
+def _build_configuration(frozen_items: tuple[tuple[str, Any], ...]) -> Configuration:
+    """
+    根据冻结的配置项构造并缓存Configuration实例
+
+    注意：返回的实例会在多次调用之间共享，调用方只能读取、不能修改。
+
+    Args:
+        frozen_items: 排好序的 (字段名, 值) 元组
+
+    Returns:
+        Configuration: 缓存的配置实例
+    """
+    return Configuration(**dict(frozen_items))
+
+
+# 配置字段名：只计算一次，避免每次遍历 model_fields
+_FIELD_NAMES = tuple(Configuration.model_fields.keys())
+
 # ========== 配置系统设计说明 ==========
 #
 # 1. 层次化配置：
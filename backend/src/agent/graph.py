@@ -9,10 +9,15 @@
 #
 # 类比：就像一个资深研究员的标准作业流程(SOP)
 
+import asyncio
+import functools
+import itertools
 import os
+import re
+from collections import OrderedDict
 
 # 导入我们自定义的工具和数据结构
-from agent.tools_and_schemas import SearchQueryList, Reflection
+from agent.tools_and_schemas import SearchQueryList, Reflection, ReflectionWithSummary
 from dotenv import load_dotenv
 
 # LangChain和LangGraph的核心组件
@@ -23,24 +28,26 @@ from langgraph.graph import START, END
 from langchain_core.runnables import RunnableConfig
 
 # Google AI客户端，用于调用Gemini模型和搜索功能
-from google.genai import Client
+import httpx
+from google.genai import Client, types
 
 # 导入我们定义的状态类型和配置
 from agent.state import (
     OverallState,           # 整体状态：贯穿整个工作流的信息容器
     QueryGenerationState,   # 查询生成状态：存储生成的搜索关键词
     ReflectionState,        # 反思状态：存储分析结果和后续查询
-    WebSearchState,         # 网络搜索状态：单个搜索任务的状态
+    WebSearchState,         # 网络搜索状态：一批搜索任务的状态
 )
 from agent.configuration import Configuration
 
 # 导入所有的提示词模板
 from agent.prompts import (
-    get_current_date,                # 获取当前日期的工具函数
-    query_writer_instructions,       # 查询生成的提示词
-    web_searcher_instructions,       # 网络搜索的提示词
-    reflection_instructions,         # 反思分析的提示词
-    answer_instructions,             # 最终答案生成的提示词
+    get_current_date,                   # 获取当前日期的工具函数
+    render_query_writer_instructions,   # 查询生成的提示词（预编译）
+    render_web_searcher_instructions,   # 网络搜索的提示词（预编译）
+    render_reflection_instructions,     # 反思分析的提示词（预编译）
+    render_answer_instructions,         # 最终答案生成的提示词（预编译）
+    running_summary_instructions,       # 反思提示词中的累积摘要要求
 )
 
 # Google Gemini模型的LangChain集成
@@ -48,9 +55,9 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 # 导入实用工具函数
 from agent.utils import (
-    get_citations,           # 提取引用信息
+    apply_citation_markers,  # 在文本中插入引用标记
     get_research_topic,      # 从消息中提取研究主题
-    insert_citation_markers, # 在文本中插入引用标记
+    iter_citation_markers,   # 提取引用信息并构建引用标记
     resolve_urls,           # 将长URL转换为短URL
 )
 
@@ -58,13 +65,113 @@ from agent.utils import (
 load_dotenv()
 
 # 检查必需的API密钥
-if os.getenv("GEMINI_API_KEY") is None:
+# 只在导入时读取一次，之后所有客户端都使用这个常量
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+if GEMINI_API_KEY is None:
     raise ValueError("GEMINI_API_KEY is not set")
 
+# HTTP连接池配置
+# SDK为每个Client复用同一个httpx客户端，连接池本身已经存在；
+# httpx默认的空闲连接只保留5秒，而两轮研究之间（反思、生成查询）通常超过5秒，
+# 下一批搜索就要重新建立TLS连接。这里把空闲保留时间延长到60秒。
+# 注意：httpx.Limits 的参数没有默认上限，所以连接数显式写成httpx的默认值
+# （max_connections=100, max_keepalive_connections=20），只改变 keepalive_expiry。
+GENAI_HTTP_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=20,
+    keepalive_expiry=60,
+)
+
 # 创建Google AI客户端，用于Google搜索API
 # 注意：这里使用原生的Google客户端而不是LangChain客户端，
 # 因为原生客户端能返回更详细的引用元数据
-genai_client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+# 只配置异步客户端：web_research 只通过 genai_client.aio 发起请求
+genai_client = Client(
+    api_key=GEMINI_API_KEY,
+    http_options=types.HttpOptions(
+        async_client_args={"limits": GENAI_HTTP_LIMITS},
+    ),
+)
+
+# ========== LLM 客户端缓存 ==========
+# ChatGoogleGenerativeAI 的构造（解析API密钥、创建HTTP客户端）以及
+# with_structured_output 的结构化模式转换都比较昂贵，
+# 而同一个 (模型, 温度) 组合在每次请求、每轮循环中都会重复使用，
+# 所以这里按参数缓存实例，整个进程内共享。
+
+@functools.lru_cache(maxsize=8)
+def _get_llm(model: str, temperature: float) -> ChatGoogleGenerativeAI:
+    """
+    获取（并缓存）指定模型和温度的 Gemini 聊天模型实例
+
+    Args:
+        model: 模型名称，例如 "gemini-2.0-flash"
+        temperature: 采样温度
+
+    Returns:
+        ChatGoogleGenerativeAI: 进程内共享的模型实例
+    """
+    return ChatGoogleGenerativeAI(
+        model=model,
+        temperature=temperature,
+        max_retries=2,      # 网络错误时的重试次数
+        api_key=GEMINI_API_KEY,
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _get_structured_llm(model: str, temperature: float, schema: type):
+    """
+    获取（并缓存）绑定了结构化输出模式的模型
+
+    Args:
+        model: 模型名称
+        temperature: 采样温度
+        schema: 期望AI返回的Pydantic模型，例如 SearchQueryList
+
+    Returns:
+        绑定了结构化输出的Runnable，调用后直接返回 schema 实例
+    """
+    return _get_llm(model, temperature).with_structured_output(schema)
+
+
+# ========== 研究摘要拼接 ==========
+# reflection 和 finalize_answer 都需要把搜索结果放进提示词。
+# reflection 每轮都会输出一份累积摘要（running_summary），
+# 之后的提示词只包含这份摘要和新增的搜索结果，
+# 提示词长度随循环次数线性增长，而不是随全部搜索结果的总量增长。
+
+# 搜索结果之间的分隔符
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+
+
+def _get_summaries(state: OverallState) -> tuple[str, int]:
+    """
+    构建提示词中的研究摘要：累积摘要 + 新增的搜索结果
+    
+    Args:
+        state: 包含 web_research_result、running_summary 以及上一次摘要缓存的整体状态
+        
+    Returns:
+        (摘要字符串, 已覆盖的结果数量)，可直接写回状态作为新的缓存
+    """
+    results = state["web_research_result"]
+    running_summary = state.get("running_summary") or ""
+    covered_len = state.get("summaries_len") or 0
+    cached = state.get("summaries_cache")
+
+    # 上次反思之后没有新的搜索结果（finalize_answer的情况），
+    # 直接复用上次反思使用的摘要：上一轮累积摘要 + 最后一批原始结果
+    if covered_len == len(results) and cached:
+        return cached, covered_len
+
+    # 还没有累积摘要，或者状态不一致（结果列表变短），使用全部原始结果
+    if not running_summary or covered_len > len(results):
+        return SUMMARY_SEPARATOR.join(results), len(results)
+
+    # 累积摘要 + 新增的结果
+    new_summaries = SUMMARY_SEPARATOR.join(results[covered_len:])
+    return running_summary + SUMMARY_SEPARATOR + new_summaries, len(results)
 
 
 # ========== LangGraph 节点定义 ==========
@@ -99,78 +206,177 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
     if state.get("initial_search_query_count") is None:
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
-    # 初始化 Gemini 2.0 Flash 模型
+    # 获取 Gemini 2.0 Flash 模型（进程内缓存，不会每次重新创建）
     # 这个模型专门用于查询生成，速度快且效果好
-    llm = ChatGoogleGenerativeAI(
-        model=configurable.query_generator_model,  # 默认使用 gemini-2.0-flash
-        temperature=1.0,    # 较高的温度确保查询的多样性
-        max_retries=2,      # 网络错误时的重试次数
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
-    
     # 使用结构化输出，确保AI返回的是我们期望的JSON格式
     # 这样可以避免解析错误，提高系统稳定性
-    structured_llm = llm.with_structured_output(SearchQueryList)
+    structured_llm = _get_structured_llm(
+        configurable.query_generator_model,  # 默认使用 gemini-2.0-flash
+        1.0,    # 较高的温度确保查询的多样性
+        SearchQueryList,
+    )
 
     # 构建给AI的提示词
+    # 当前日期在每次工作流调用时只计算一次，并写入状态供后续节点复用，
+    # 保证同一次研究中所有提示词使用的日期一致
     current_date = get_current_date()  # 获取当前日期，确保搜索的时效性
-    formatted_prompt = query_writer_instructions.format(
+    # 研究主题同样只提取一次，后续节点直接从状态中读取，不再遍历消息历史
+    research_topic = get_research_topic(state["messages"])  # 从对话历史中提取研究主题
+    formatted_prompt = render_query_writer_instructions(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),  # 从对话历史中提取研究主题
+        research_topic=research_topic,
         number_queries=state["initial_search_query_count"],    # 要生成的查询数量
     )
     
     # 调用AI生成搜索查询
     result = structured_llm.invoke(formatted_prompt)
     
-    # 返回状态更新：将生成的查询添加到状态中
-    return {"search_query": result.query}
+    # 返回状态更新：将生成的查询、本次研究的日期和研究主题添加到状态中
+    return {
+        "search_query": result.query,
+        "current_date": current_date,
+        "research_topic": research_topic,
+    }
 
 
-def continue_to_web_research(state: QueryGenerationState):
+def continue_to_web_research(state: OverallState):
     """
-    路由函数：将搜索查询分发到多个并行的网络搜索节点
+    路由函数：把生成的搜索查询作为一个批次交给网络搜索节点
     
-    作用：为每个搜索查询创建一个独立的搜索任务
+    作用：为所有搜索查询创建一个批量搜索任务
     
     工作原理：
-    1. 遍历所有生成的搜索查询
-    2. 为每个查询创建一个Send消息
-    3. LangGraph会并行执行这些搜索任务
+    1. 收集所有生成的搜索查询
+    2. 创建一个携带整批查询的Send消息
+    3. web_research节点在同一个事件循环中并发执行这些查询
     
     类比：就像图书馆管理员同时派出多个助手去不同的书架
          查找资料，提高效率
     
     Args:
-        state: 包含搜索查询列表的状态
+        state: 包含搜索查询列表和本次研究日期的整体状态
         
     Returns:
-        Send消息列表，每个消息对应一个并行的搜索任务
+        Send消息列表，只包含一个批量搜索任务
     """
     return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
-        for idx, search_query in enumerate(state["search_query"])
+        Send(
+            "web_research",
+            {
+                "search_queries": list(state["search_query"]),
+                "id_offset": 0,
+                "current_date": state["current_date"],
+            },
+        )
     ]
 
 
-def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+# 同时进行的Google搜索请求上限，避免触发API速率限制
+MAX_CONCURRENT_SEARCHES = 8
+
+# 搜索结果缓存：{(模型, 规范化查询, 日期): Gemini响应}
+# 补充查询经常与之前的查询重复，命中时无需再次调用Google搜索。
+# 缓存完整的响应对象，因为后续处理需要其中的grounding_metadata。
+SEARCH_CACHE_MAX_SIZE = 256
+_search_cache: OrderedDict = OrderedDict()
+
+
+async def _search_one(
+    search_query: str,
+    query_id: int,
+    current_date: str,
+    model: str,
+    semaphore: asyncio.Semaphore,
+    use_cache: bool = True,
+) -> tuple[str, list]:
+    """
+    执行单个搜索查询，返回带引用的文本和信息源
+    
+    Args:
+        search_query: 要搜索的具体查询
+        query_id: 查询的唯一ID，用于生成不冲突的短URL
+        current_date: 本次研究的日期
+        model: 用于搜索和总结的模型名称
+        semaphore: 限制并发请求数量的信号量
+        use_cache: 是否使用进程内的搜索结果缓存
+        
+    Returns:
+        (带引用标记的搜索结果文本, 信息源列表)
+    """
+    # 构建搜索提示词
+    formatted_prompt = render_web_searcher_instructions(
+        current_date=current_date,
+        research_topic=search_query,  # 当前要搜索的具体查询
+    )
+
+    # 先查缓存：同一天内相同的查询（忽略大小写和首尾空格）直接复用响应
+    cache_key = (model, search_query.strip().lower(), current_date)
+    response = _search_cache.get(cache_key) if use_cache else None
+    if response is not None:
+        _search_cache.move_to_end(cache_key)
+    else:
+        # 使用Google原生异步客户端进行搜索
+        # 注意：这里不使用LangChain的Google搜索客户端，因为原生客户端
+        # 能够返回更详细的引用元数据(grounding_metadata)
+        async with semaphore:
+            response = await genai_client.aio.models.generate_content(
+                model=model,
+                contents=formatted_prompt,
+                config={
+                    "tools": [{"google_search": {}}],  # 启用Google搜索工具
+                    "temperature": 0,  # 低温度确保搜索结果的一致性
+                },
+            )
+    
+    # 处理搜索结果和引用信息
+    # 1. 将复杂的URL转换为简短的ID格式，节省令牌和处理时间
+    resolved_urls = resolve_urls(
+        response.candidates[0].grounding_metadata.grounding_chunks, 
+        query_id  # 使用搜索任务的ID来确保URL的唯一性
+    )
+    
+    # 2. 提取引用信息（来源标题、URL等），同时构建引用标记 [来源标题](短URL)
+    #    一次遍历完成，不再先生成引用字典再单独遍历构建标记
+    markers = list(iter_citation_markers(response, resolved_urls))
+    
+    # 3. 在生成的文本中插入引用标记
+    modified_text = apply_citation_markers(response.text, markers)
+    
+    # 4. 收集所有的信息源，用于最终的引用列表
+    sources_gathered = list(
+        itertools.chain.from_iterable(marker.segments for marker in markers)
+    )
+
+    # 响应处理成功后才写入缓存，超出容量时淘汰最久未使用的条目
+    if use_cache and cache_key not in _search_cache:
+        _search_cache[cache_key] = response
+        if len(_search_cache) > SEARCH_CACHE_MAX_SIZE:
+            _search_cache.popitem(last=False)
+
+    return modified_text, sources_gathered
+
+
+async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """
     节点2: 网络搜索执行器
     
-    作用：使用Google搜索API执行实际的网络搜索
+    作用：使用Google搜索API并发执行一批网络搜索
     
     工作原理：
-    1. 接收一个搜索查询
-    2. 调用Google搜索API获取相关网页
+    1. 接收一批搜索查询
+    2. 并发调用Google搜索API获取相关网页（受并发上限约束）
     3. 使用Gemini模型分析和总结搜索结果
     4. 提取引用信息和来源链接
     5. 将长URL转换为短URL以节省令牌
     
-    类比：就像一个专业的研究助手，不仅能找到信息，
+    所有查询都在同一个事件循环中等待网络响应，
+    总耗时接近最慢的一次搜索，而不是所有搜索耗时之和。
+    
+    类比：就像一个专业的研究助手团队，不仅能找到信息，
          还能立即分析内容并整理出重点
     
     Args:
-        state: 包含单个搜索查询和ID的状态
+        state: 包含一批搜索查询和起始ID的状态
         config: 运行时配置
         
     Returns:
@@ -178,46 +384,31 @@ def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """
     # 获取配置参数
     configurable = Configuration.from_runnable_config(config)
-    
-    # 构建搜索提示词
-    formatted_prompt = web_searcher_instructions.format(
-        current_date=get_current_date(),
-        research_topic=state["search_query"],  # 当前要搜索的具体查询
-    )
 
-    # 使用Google原生客户端进行搜索
-    # 注意：这里不使用LangChain的Google搜索客户端，因为原生客户端
-    # 能够返回更详细的引用元数据(grounding_metadata)
-    response = genai_client.models.generate_content(
-        model=configurable.query_generator_model,
-        contents=formatted_prompt,
-        config={
-            "tools": [{"google_search": {}}],  # 启用Google搜索工具
-            "temperature": 0,  # 低温度确保搜索结果的一致性
-        },
-    )
-    
-    # 处理搜索结果和引用信息
-    # 1. 将复杂的URL转换为简短的ID格式，节省令牌和处理时间
-    resolved_urls = resolve_urls(
-        response.candidates[0].grounding_metadata.grounding_chunks, 
-        state["id"]  # 使用搜索任务的ID来确保URL的唯一性
+    # 信号量在每次调用时创建，保证它绑定到当前的事件循环
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+    search_queries = state["search_queries"]
+    results = await asyncio.gather(
+        *[
+            _search_one(
+                search_query,
+                state["id_offset"] + idx,
+                state["current_date"],
+                configurable.query_generator_model,
+                semaphore,
+                configurable.enable_search_cache,
+            )
+            for idx, search_query in enumerate(search_queries)
+        ]
     )
-    
-    # 2. 提取引用信息，包括来源标题、URL等
-    citations = get_citations(response, resolved_urls)
-    
-    # 3. 在生成的文本中插入引用标记，如 [来源标题](短URL)
-    modified_text = insert_citation_markers(response.text, citations)
-    
-    # 4. 收集所有的信息源，用于最终的引用列表
-    sources_gathered = [item for citation in citations for item in citation["segments"]]
 
-    # 返回状态更新
+    # 返回状态更新（按查询顺序合并各个搜索的结果）
     return {
-        "sources_gathered": sources_gathered,        # 收集的信息源
-        "search_query": [state["search_query"]],     # 当前搜索查询（保持数组格式）
-        "web_research_result": [modified_text],      # 带引用的搜索结果文本
+        "sources_gathered": list(
+            itertools.chain.from_iterable(sources for _, sources in results)
+        ),                                                       # 收集的信息源
+        "search_query": list(search_queries),                    # 本批次的搜索查询
+        "web_research_result": [text for text, _ in results],    # 带引用的搜索结果文本
     }
 
 
@@ -252,25 +443,35 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
     # 获取推理模型，默认使用配置中的反思模型
     reasoning_model = state.get("reasoning_model", configurable.reflection_model)
 
+    # 只有后面还可能有下一轮反思时才需要累积摘要
+    # 本轮已达到最大循环次数时，evaluate_research一定会进入最终答案生成，
+    # finalize_answer使用的是本轮的摘要输入，新的累积摘要不会再被读取
+    max_research_loops = state.get("max_research_loops")
+    if max_research_loops is None:
+        max_research_loops = configurable.max_research_loops
+    needs_running_summary = state["research_loop_count"] < max_research_loops
+
     # 构建反思提示词
-    current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
+    # 上一轮的累积摘要 + 本轮新增的搜索结果，用分隔符连接
+    summaries, summaries_len = _get_summaries(state)
+    current_date = state.get("current_date") or get_current_date()
+    formatted_prompt = render_reflection_instructions(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        # 将所有搜索结果合并，用分隔符连接
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
-    )
-    
-    # 初始化推理模型（通常使用更强大的模型如Gemini 2.5 Flash）
-    llm = ChatGoogleGenerativeAI(
-        model=reasoning_model,
-        temperature=1.0,    # 适中的温度，平衡创造性和准确性
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+        research_topic=state.get("research_topic") or get_research_topic(state["messages"]),
+        summaries=summaries,
+        running_summary_instructions=(
+            running_summary_instructions if needs_running_summary else ""
+        ),
     )
     
+    # 获取推理模型（通常使用更强大的模型如Gemini 2.5 Flash）
     # 使用结构化输出确保返回格式正确
-    result = llm.with_structured_output(Reflection).invoke(formatted_prompt)
+    structured_llm = _get_structured_llm(
+        reasoning_model,
+        1.0,    # 适中的温度，平衡创造性和准确性
+        ReflectionWithSummary if needs_running_summary else Reflection,
+    )
+    result = structured_llm.invoke(formatted_prompt)
 
     # 返回反思结果
     return {
@@ -279,6 +480,10 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
         "follow_up_queries": result.follow_up_queries,   # 建议的补充查询
         "research_loop_count": state["research_loop_count"],  # 更新循环计数
         "number_of_ran_queries": len(state["search_query"]),  # 已执行的查询数量
+        "summaries_cache": summaries,                     # 本次使用的摘要，供finalize_answer复用
+        "summaries_len": summaries_len,                   # 累积摘要覆盖的结果数量
+        # 新的累积摘要：没有请求或AI没有返回时为空，下一轮会退回使用全部原始结果
+        "running_summary": getattr(result, "running_summary", None) or "",
     }
 
 
@@ -294,7 +499,8 @@ def evaluate_research(
     决策逻辑：
     1. 如果AI认为信息已经充分 → 进入最终答案生成
     2. 如果达到最大研究循环次数 → 强制进入最终答案生成
-    3. 否则 → 使用补充查询继续搜索
+    3. 如果没有可用的补充查询 → 用现有信息生成最终答案
+    4. 否则 → 使用补充查询继续搜索
     
     类比：就像项目管理中的检查点，决定项目是否可以进入下一阶段
          还是需要继续当前阶段的工作
@@ -306,31 +512,34 @@ def evaluate_research(
     Returns:
         字符串标识下一个节点，或者Send消息列表用于继续搜索
     """
-    configurable = Configuration.from_runnable_config(config)
-    
     # 获取最大研究循环次数限制
-    max_research_loops = (
-        state.get("max_research_loops")
-        if state.get("max_research_loops") is not None
-        else configurable.max_research_loops
-    )
+    # 状态中已有（用户在请求中指定）时直接使用，只有缺失时才读取配置
+    max_research_loops = state.get("max_research_loops")
+    if max_research_loops is None:
+        max_research_loops = Configuration.from_runnable_config(
+            config
+        ).max_research_loops
     
     # 决策逻辑
     if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
         # 情况1: 信息充分，或者已达到最大循环次数
         return "finalize_answer"
+    elif not state["follow_up_queries"]:
+        # 情况2: 信息不充分但没有给出补充查询，无法继续搜索
+        # 直接用已收集的信息生成最终答案，否则流程会在没有回答的情况下结束
+        return "finalize_answer"
     else:
-        # 情况2: 需要继续搜索，为每个补充查询创建新的搜索任务
+        # 情况3: 需要继续搜索，把所有补充查询作为一个批次派发
         return [
             Send(
                 "web_research",
                 {
-                    "search_query": follow_up_query,
+                    "search_queries": list(state["follow_up_queries"]),
                     # 为新查询分配唯一ID，基于已有查询数量
-                    "id": state["number_of_ran_queries"] + int(idx),
+                    "id_offset": state["number_of_ran_queries"],
+                    "current_date": state["current_date"],
                 },
             )
-            for idx, follow_up_query in enumerate(state["follow_up_queries"])
         ]
 
 
@@ -363,39 +572,61 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     reasoning_model = state.get("reasoning_model") or configurable.answer_model
 
     # 构建最终答案生成的提示词
-    current_date = get_current_date()
-    formatted_prompt = answer_instructions.format(
+    current_date = state.get("current_date") or get_current_date()
+    formatted_prompt = render_answer_instructions(
         current_date=current_date,
-        research_topic=get_research_topic(state["messages"]),
-        # 合并所有搜索结果，用分隔符清晰地分开
-        summaries="\n---\n\n".join(state["web_research_result"]),
+        research_topic=state.get("research_topic") or get_research_topic(state["messages"]),
+        # 复用reflection节点刚刚使用的摘要：
+        # 上一轮的累积摘要 + 最后一轮的原始搜索结果
+        summaries=_get_summaries(state)[0],
     )
 
-    # 初始化推理模型（默认使用 Gemini 2.5 Pro，最强的推理能力）
-    llm = ChatGoogleGenerativeAI(
-        model=reasoning_model,
-        temperature=0,      # 低温度确保答案的一致性和准确性
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+    # 获取推理模型（默认使用 Gemini 2.5 Pro，最强的推理能力）
+    llm = _get_llm(
+        reasoning_model,
+        0,      # 低温度确保答案的一致性和准确性
     )
     
     # 生成最终答案
     result = llm.invoke(formatted_prompt)
 
     # 处理引用链接：将短URL替换回原始URL，并整理最终的信息源列表
-    unique_sources = []
+    # 所有短URL合并成一个正则，只扫描一遍答案文本
+    content = result.content
+    short_url_sources = {}
     for source in state["sources_gathered"]:
-        if source["short_url"] in result.content:
-            # 将答案中的短URL替换为原始URL
-            result.content = result.content.replace(
-                source["short_url"], source["value"]
+        short_url = source["short_url"]
+        if short_url and short_url not in short_url_sources:
+            short_url_sources[short_url] = source
+
+    unique_sources = []
+    if short_url_sources:
+        # 按长度从长到短排列，避免 ".../id/1-1" 抢先匹配 ".../id/1-10"
+        pattern = re.compile(
+            "|".join(
+                re.escape(short_url)
+                for short_url in sorted(short_url_sources, key=len, reverse=True)
             )
-            # 添加到最终的信息源列表中
-            unique_sources.append(source)
+        )
+        cited_short_urls = set()
+
+        def restore_url(match: re.Match) -> str:
+            # 将答案中的短URL替换为原始URL，并记录被引用过的来源
+            short_url = match.group(0)
+            cited_short_urls.add(short_url)
+            return short_url_sources[short_url]["value"]
+
+        content = pattern.sub(restore_url, content)
+        # 只把答案中实际引用的来源添加到最终的信息源列表中
+        unique_sources = [
+            source
+            for short_url, source in short_url_sources.items()
+            if short_url in cited_short_urls
+        ]
 
     # 返回最终结果
     return {
-        "messages": [AIMessage(content=result.content)],  # 生成的AI回答
+        "messages": [AIMessage(content=content)],  # 生成的AI回答
         "sources_gathered": unique_sources,               # 整理后的信息源列表
     }
 
@@ -419,8 +650,8 @@ builder.add_node("finalize_answer", finalize_answer)    # 最终答案节点
 # START 是 LangGraph 的特殊标记，表示图的入口
 builder.add_edge(START, "generate_query")
 
-# 添加条件边：从查询生成到并行网络搜索
-# continue_to_web_research 函数会为每个查询创建并行的搜索任务
+# 添加条件边：从查询生成到网络搜索
+# continue_to_web_research 函数把所有查询打包成一个并发执行的搜索批次
 builder.add_conditional_edges(
     "generate_query", 
     continue_to_web_research, 
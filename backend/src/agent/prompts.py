@@ -15,6 +15,8 @@
 # 5. 包含示例：通过例子帮助AI理解期望的输出
 
 from datetime import datetime
+from string import Formatter
+from typing import Callable
 
 
 def get_current_date():
@@ -30,6 +32,50 @@ def get_current_date():
     return datetime.now().strftime("%B %d, %Y")
 
 
+def compile_template(template: str) -> Callable[..., str]:
+    """
+    把提示词模板预编译成渲染函数
+    
+    str.format 每次调用都要重新解析整个模板（查找 {} 占位符、处理转义），
+    而提示词模板很长且在每个节点调用时都会渲染一次。
+    这里只解析一次，把模板拆成固定文本片段和占位符位置，
+    渲染时只需要填入参数并拼接。
+    
+    与 str.format 的行为一致：
+    - {{ 和 }} 会被还原为 { 和 }
+    - 缺少参数时抛出 KeyError，多余的参数会被忽略
+    
+    Args:
+        template: 使用 {name} 占位符的模板字符串（不支持格式说明符）
+        
+    Returns:
+        Callable[..., str]: 接收关键字参数、返回渲染结果的函数
+        
+    示例：
+        render = compile_template("今天是 {current_date}")
+        render(current_date="December 15, 2024")  # "今天是 December 15, 2024"
+    """
+    chunks: list[str] = []
+    slots: list[tuple[int, str]] = []
+    for literal, field_name, format_spec, conversion in Formatter().parse(template):
+        if literal:
+            chunks.append(literal)
+        if field_name is None:
+            continue
+        if format_spec or conversion:
+            raise ValueError(f"Unsupported placeholder in template: {field_name}")
+        slots.append((len(chunks), field_name))
+        chunks.append("")
+
+    def render(**kwargs) -> str:
+        parts = chunks.copy()
+        for index, field_name in slots:
+            parts[index] = str(kwargs[field_name])
+        return "".join(parts)
+
+    return render
+
+
 # ========== 查询生成提示词 ==========
 query_writer_instructions = """
 你的任务是为高级自动化网络研究工具生成精密且多样化的网络搜索查询。
@@ -206,7 +252,7 @@ reflection_instructions = """
 }}
 ```
 
-# 🧠 开始分析
+{running_summary_instructions}# 🧠 开始分析
 
 请仔细分析以下研究摘要，并按照上述标准进行评估：
 
@@ -217,6 +263,30 @@ reflection_instructions = """
 """
 
 
+# 反思提示词中的累积摘要要求
+# 只有后面还可能有下一轮反思时才插入到 {running_summary_instructions} 位置，
+# 否则传入空字符串，AI只需要输出上面的三个字段
+# 注意：这段文本作为参数填入，不经过模板解析，所以花括号不需要转义
+running_summary_instructions = """## 累积摘要要求
+除上述字段外，还需要在JSON中返回 "running_summary" 字段：
+- 把下方全部研究摘要（包括之前的累积摘要和新的搜索结果）整合成一份简洁的累积摘要
+- 保留所有关键事实、数据、日期和不同来源的观点
+- 每条信息后面的markdown引用链接 `[来源名称](URL)` 必须原样保留，不能修改或省略URL
+- 这份摘要会替代原始搜索结果用于下一轮分析，请确保信息不丢失
+
+示例：
+```json
+{
+    "is_sufficient": false,
+    "knowledge_gap": "缺少最新的技术规格和性能基准测试数据",
+    "follow_up_queries": ["最新GPU性能基准测试2024"],
+    "running_summary": "RTX 4090采用Ada Lovelace架构，拥有16384个CUDA核心 [nvidia](https://vertexaisearch.cloud.google.com/id/1-0)……"
+}
+```
+
+"""
+
+
 # ========== 最终答案生成提示词 ==========
 answer_instructions = """
 你是一位资深研究报告撰写专家，负责将多轮研究收集的信息整合成为一份高质量的最终报告。
@@ -286,6 +356,16 @@ answer_instructions = """
 """
 
 
+# ========== 预编译的提示词渲染函数 ==========
+# 模板在导入时解析一次，节点中直接调用这些函数渲染提示词，
+# 效果等同于对应模板的 .format(...)
+
+render_query_writer_instructions = compile_template(query_writer_instructions)
+render_web_searcher_instructions = compile_template(web_searcher_instructions)
+render_reflection_instructions = compile_template(reflection_instructions)
+render_answer_instructions = compile_template(answer_instructions)
+
+
 # ========== 提示词设计说明 ==========
 #
 # 1. 层次化结构：每个提示词都有清晰的层次结构
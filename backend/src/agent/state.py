@@ -22,6 +22,35 @@ from typing_extensions import Annotated
 import operator
 
 
+def add_unique_sources(existing: list, new: list) -> list:
+    """
+    合并信息源列表，并按短URL去重
+    
+    同一个来源经常被多条引用重复引用，去重后状态更小，
+    finalize_answer替换URL时需要扫描的来源也更少。没有短URL的来源总是保留。
+    
+    注意：这里返回新列表而不是原地修改。LangGraph复制通道时会共享
+    通道中的值对象，原地修改会让同一批更新被重复应用。
+    
+    Args:
+        existing: 已收集的信息源列表
+        new: 节点返回的新信息源
+        
+    Returns:
+        list: 合并去重后的新列表
+    """
+    if not new:
+        return existing
+    merged = list(existing)
+    seen = {source.get("short_url") for source in existing}
+    for source in new:
+        short_url = source.get("short_url")
+        if short_url is None or short_url not in seen:
+            seen.add(short_url)
+            merged.append(source)
+    return merged
+
+
 class OverallState(TypedDict):
     """
     整体状态：贯穿整个研究工作流的主要状态容器
@@ -52,7 +81,8 @@ class OverallState(TypedDict):
     
     # 收集的信息源：所有引用的来源信息
     # 包含标题、URL、短链接等详细信息
-    sources_gathered: Annotated[list, operator.add]
+    # add_unique_sources 在追加的同时按短URL去重
+    sources_gathered: Annotated[list, add_unique_sources]
     
     # 初始搜索查询数量：第一轮要生成多少个搜索查询
     # 这个值可以由用户在前端设置（低/中/高努力程度）
@@ -69,6 +99,27 @@ class OverallState(TypedDict):
     # 推理模型：用于反思和答案生成的AI模型名称
     # 可以在运行时动态指定，支持不同的模型选择
     reasoning_model: str
+    
+    # 本次研究的日期：在generate_query中计算一次，所有提示词共用
+    # 保证同一次研究过程中"今天"的含义一致
+    current_date: str
+    
+    # 研究主题：在generate_query中从消息历史提取一次，后续节点直接复用
+    # 避免每个节点都重新遍历完整的对话历史
+    research_topic: str
+    
+    # 研究摘要缓存：上一次reflection实际使用的摘要文本
+    # 即上一轮的累积摘要 + 最后一批搜索结果，finalize_answer直接复用
+    summaries_cache: str
+    
+    # 已被 running_summary 覆盖的搜索结果数量
+    # 与 web_research_result 的长度比较即可知道哪些结果是新增的
+    summaries_len: int
+    
+    # 滚动研究摘要：reflection节点对到目前为止所有搜索结果的累积总结
+    # 下一轮反思的提示词只包含这份摘要和新增的搜索结果，而不是全部历史结果
+    # 最后一轮反思不会再有读者，不生成摘要（为空字符串）
+    running_summary: str
 
 
 class ReflectionState(TypedDict):
@@ -105,6 +156,13 @@ class ReflectionState(TypedDict):
     # 已运行查询数量：到目前为止总共执行了多少个搜索查询
     # 用于为新查询分配唯一ID
     number_of_ran_queries: int
+    
+    # 本次研究的日期：继续搜索时随补充查询一起传给web_research
+    current_date: str
+    
+    # 最大研究循环次数：用户在请求中指定的上限
+    # evaluate_research只能读取本状态中声明的字段，所以需要在这里声明
+    max_research_loops: int
 
 
 class Query(TypedDict):
@@ -136,23 +194,26 @@ class QueryGenerationState(TypedDict):
 
 class WebSearchState(TypedDict):
     """
-    网络搜索状态：单个搜索任务的状态
+    网络搜索状态：一批搜索任务的状态
     
-    这个状态用于并行的网络搜索任务。由于LangGraph支持并行执行，
-    每个搜索查询都会创建一个独立的WebSearchState实例。
+    这个状态用于批量的网络搜索任务。web_research节点会在
+    同一个事件循环中并发执行批次内的所有查询。
     
     设计要点：
-    - 只包含执行单次搜索所需的最少信息
-    - 每个并行任务都有唯一的ID
+    - 只包含执行这批搜索所需的最少信息
+    - 批次内每个查询都有唯一的ID（id_offset + 序号）
     - 搜索完成后结果会合并回OverallState
     """
     
-    # 要搜索的查询字符串
-    search_query: str
+    # 本批次要搜索的查询字符串列表
+    search_queries: list[str]
+    
+    # 本批次第一个查询的唯一标识符
+    # 第i个查询的ID为 id_offset + i，确保URL解析的唯一性
+    id_offset: int
     
-    # 搜索任务的唯一标识符
-    # 用于区分不同的并行搜索任务，确保URL解析的唯一性
-    id: str
+    # 本次研究的日期，由generate_query节点统一计算
+    current_date: str
 
 
 @dataclass(kw_only=True)
@@ -185,7 +246,7 @@ class SearchStateOutput:
 #    - OverallState: 全局状态，贯穿整个流程
 #    - ReflectionState: 反思阶段的专用状态  
 #    - QueryGenerationState: 查询生成的专用状态
-#    - WebSearchState: 并行搜索的专用状态
+#    - WebSearchState: 批量并发搜索的专用状态
 #
 # 4. 可扩展性：新增状态字段或状态类型都很容易，不会影响现有功能
 #
@@ -13,7 +13,7 @@
 # - 每个模型对应AI的一种输出格式
 # - 包含详细的字段描述，帮助AI理解期望的输出
 
-from typing import List
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
 
@@ -104,11 +104,32 @@ class Reflection(BaseModel):
     )
 
 
+class ReflectionWithSummary(Reflection):
+    """
+    带滚动摘要的反思分析结果
+    
+    在Reflection的基础上额外要求AI输出一份累积摘要。
+    只有后面还可能有下一轮反思时才使用这个模型：
+    最后一轮反思的摘要不会再被读取，生成它只会增加输出长度和延迟。
+    """
+    
+    # 滚动研究摘要
+    # 把到目前为止的全部研究摘要压缩成一份累积摘要
+    # 下一轮反思只需要读取这份摘要加上新增的搜索结果，
+    # 而不是每次都把全部历史搜索结果原样放进提示词
+    # 字段可选：AI没有返回摘要时不会导致解析失败，下一轮会退回使用全部原始结果
+    running_summary: Optional[str] = Field(
+        default=None,
+        description="到目前为止所有研究摘要的累积总结。保留所有关键事实、数据和日期，并原样保留每条信息后面的markdown引用链接 [来源名称](URL)，不要修改或省略任何URL。",
+    )
+
+
 # ========== 数据模型设计原则 ==========
 #
 # 1. 简洁性：只包含必要的字段，避免复杂性
 #    - SearchQueryList: 查询列表 + 理由
 #    - Reflection: 判断 + 缺口 + 后续查询
+#    - ReflectionWithSummary: Reflection + 滚动摘要（还有下一轮时使用）
 #
 # 2. 自描述：通过Field描述清楚每个字段的用途
 #    - 帮助AI理解期望的输出内容
@@ -131,22 +152,34 @@ class Reflection(BaseModel):
 #    - 自动序列化为JSON
 #    - 支持复杂的嵌套结构
 #
+# 7. 性能：模式转换只做一次
+#    - with_structured_output 会把模型转换成函数声明（JSON Schema），
+#      这一步比单次字段验证昂贵得多
+#    - graph.py 中的 _get_structured_llm 按 (模型, 温度, 模式) 缓存绑定结果，
+#      所以每个模式在进程内只转换一次
+#    - 保持使用BaseModel：节点代码依赖 result.query 等属性访问，
+#      且每次LLM调用只验证一次返回值，这部分开销可以忽略
+#
 # ========== 使用示例 ==========
 #
 # 在LangGraph节点中使用：
 #
 # ```python
-# # 查询生成节点
-# structured_llm = llm.with_structured_output(SearchQueryList)
+# # 查询生成节点（结构化模型已按参数缓存）
+# structured_llm = _get_structured_llm(model, 1.0, SearchQueryList)
 # result = structured_llm.invoke(prompt)
 # # result.query 是查询列表
 # # result.rationale 是生成理由
 #
 # # 反思分析节点  
-# structured_llm = llm.with_structured_output(Reflection)
+# structured_llm = _get_structured_llm(model, 1.0, Reflection)
 # result = structured_llm.invoke(prompt)
 # # result.is_sufficient 用于路由决策
 # # result.follow_up_queries 用于继续搜索
+#
+# # 还有下一轮时使用带摘要的模式
+# structured_llm = _get_structured_llm(model, 1.0, ReflectionWithSummary)
+# # result.running_summary 作为下一轮的累积摘要
 # ```
 #
 # 这种设计确保了AI输出的数据质量和系统的稳定性
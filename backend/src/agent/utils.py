@@ -5,7 +5,7 @@
 # 主要功能模块：
 # 1. 消息处理：从对话历史中提取研究主题
 # 2. URL管理：将长URL转换为短URL，节省令牌
-# 3. 引用处理：提取和插入引用信息
+# 3. 引用处理：提取和插入引用信息（搜索节点使用融合的单次遍历版本）
 # 4. 文本处理：在指定位置插入引用标记
 #
 # 设计原则：
@@ -14,10 +14,29 @@
 # - 错误处理：包含适当的异常处理逻辑
 # - 性能优化：考虑处理大量数据时的效率
 
-from typing import Any, Dict, List
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, NamedTuple
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
 
 
+# 引用标记的排序键：(结束位置, 开始位置)
+# itemgetter 在C层取值，比 lambda 少一次Python函数调用
+_MARKER_POSITION = itemgetter(0, 1)
+
+# 对话历史中的角色前缀
+_USER_PREFIX = "User: "
+_ASSISTANT_PREFIX = "Assistant: "
+
+# 消息类型 → 对话历史中的角色前缀
+_ROLE_PREFIXES = {
+    HumanMessage: _USER_PREFIX,
+    AIMessage: _ASSISTANT_PREFIX,
+}
+
+# 短URL的统一前缀
+_SHORT_URL_PREFIX = "https://vertexaisearch.cloud.google.com/id/"
+
+
 def get_research_topic(messages: List[AnyMessage]) -> str:
     """
     从消息历史中提取研究主题
@@ -58,12 +77,20 @@ def get_research_topic(messages: List[AnyMessage]) -> str:
         research_topic = messages[-1].content
     else:
         # 多轮对话：构建完整的对话历史
-        research_topic = ""
+        # 先收集各行再一次性拼接，避免 += 在长对话中反复复制已拼接的前缀
+        parts = []
         for message in messages:
-            if isinstance(message, HumanMessage):
-                research_topic += f"User: {message.content}\n"
-            elif isinstance(message, AIMessage):
-                research_topic += f"Assistant: {message.content}\n"
+            # 常见情况按确切类型直接查表，子类再回退到 isinstance 判断
+            prefix = _ROLE_PREFIXES.get(type(message))
+            if prefix is None:
+                if isinstance(message, HumanMessage):
+                    prefix = _USER_PREFIX
+                elif isinstance(message, AIMessage):
+                    prefix = _ASSISTANT_PREFIX
+                else:
+                    continue  # 跳过系统消息、工具消息等
+            parts.append(f"{prefix}{message.content}\n")
+        research_topic = "".join(parts)
     
     return research_topic
 
@@ -106,19 +133,22 @@ def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
             "https://another.example.com/url": "https://vertexaisearch.cloud.google.com/id/5-1"
         }
     """
-    # 短URL的统一前缀
-    prefix = f"https://vertexaisearch.cloud.google.com/id/"
-    
-    # 提取所有原始URL
-    urls = [site.web.uri for site in urls_to_resolve]
+    # 没有需要解析的URL（搜索没有返回来源）
+    if not urls_to_resolve:
+        return {}
+
+    # 短URL的统一前缀 + 任务ID，循环外只拼接一次
+    prefix_id = _SHORT_URL_PREFIX + str(id) + "-"
 
     # 创建URL映射字典
-    # 使用字典确保每个原始URL只映射一次，即使它在列表中出现多次
+    # 单次遍历直接读取原始URL，不再先构建中间列表
+    # setdefault 保证每个原始URL只映射一次（保留第一次出现时的索引），
+    # 即使它在列表中出现多次
     resolved_map = {}
-    for idx, url in enumerate(urls):
-        if url not in resolved_map:
-            # 生成唯一的短URL：前缀 + 任务ID + 索引
-            resolved_map[url] = f"{prefix}{id}-{idx}"
+    setdefault = resolved_map.setdefault
+    for idx, site in enumerate(urls_to_resolve):
+        # 生成唯一的短URL：前缀 + 任务ID + 索引
+        setdefault(site.web.uri, prefix_id + str(idx))
 
     return resolved_map
 
@@ -128,16 +158,18 @@ def insert_citation_markers(text, citations_list):
     在文本中插入引用标记
     
     这个函数负责在AI生成的文本中的正确位置插入引用链接。
-    采用从后向前插入的策略，确保插入过程不会影响其他位置的索引。
+    采用一次线性拼接的策略：按原始文本中的位置切分文本，
+    在切分点之间放入引用标记，最后一次性拼接成新文本。
     
     引用插入原理：
-    1. 按照结束位置从大到小排序（倒序）
-    2. 从文本末尾开始插入引用标记
-    3. 这样可以避免前面的插入影响后面位置的索引
+    1. 按照结束位置从小到大排序（正序）
+    2. 从头到尾依次取出两个插入点之间的原始文本片段和对应的引用标记
+    3. 所有位置都基于原始文本，插入不会影响其他位置的索引
+    4. 每次插入不再复制整段文本，总开销与文本长度和引用数量之和成正比
     
     Args:
         text (str): 原始文本，由AI生成的搜索结果摘要
-        citations_list (list): 引用信息列表，每个元素包含：
+        citations_list (list[Citation]): 引用信息列表（get_citations的返回值），每个元素包含：
             - start_index: 引用文本的开始位置
             - end_index: 引用文本的结束位置
             - segments: 引用的来源信息列表
@@ -149,53 +181,89 @@ def insert_citation_markers(text, citations_list):
         在指定位置插入格式为 " [来源标题](短URL)" 的引用链接
         
     工作流程：
-        1. 对引用列表按end_index降序排序
-        2. 为每个引用构建标记字符串
-        3. 在指定位置插入标记
+        1. 为每个引用构建标记字符串
+        2. 交给 apply_citation_markers 按位置排序并一次拼接
+        
+    注意：web_research节点直接使用 iter_citation_markers + apply_citation_markers，
+         不再经过引用字典；这个函数保留给需要先查看引用结构的调用方。
         
     示例：
         Input:
         - text: "苹果公司Q3营收增长了15%。特斯拉销量也在上升。"
         - citations_list: [
-            {
-                "start_index": 0,
-                "end_index": 12,
-                "segments": [{"label": "Apple财报", "short_url": "https://..."}]
-            }
+            Citation(
+                start_index=0,
+                end_index=12,
+                segments=[{"label": "Apple财报", "short_url": "https://..."}],
+            )
         ]
         
         Output: "苹果公司Q3营收增长了15% [Apple财报](https://...)。特斯拉销量也在上升。"
     """
-    # 对引用列表进行排序
-    # 1. 主要按end_index降序排列（从后往前处理）
-    # 2. 如果end_index相同，按start_index降序排列
-    # 这样可以确保插入操作不会影响后续位置的索引
-    sorted_citations = sorted(
-        citations_list, 
-        key=lambda c: (c["end_index"], c["start_index"]), 
-        reverse=True
-    )
-
-    modified_text = text
-    
-    # 逐个插入引用标记
-    for citation_info in sorted_citations:
-        # 获取插入位置（原始文本中的结束位置）
-        end_idx = citation_info["end_index"]
-        
-        # 构建引用标记字符串
-        marker_to_insert = ""
-        for segment in citation_info["segments"]:
-            # 每个来源都生成一个markdown格式的链接
-            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
-        
-        # 在指定位置插入引用标记
-        # 由于我们从后往前处理，end_idx位置仍然有效
-        modified_text = (
-            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
+    # 没有引用或文本为空时无需插入，直接返回原文
+    # 很多搜索结果没有任何支撑信息，这是最常见的情况
+    if not citations_list or not text:
+        return text
+
+    # 预先构建每个引用的标记字符串：每个来源都生成一个markdown格式的链接
+    markers = [
+        (
+            citation_info.end_index,
+            citation_info.start_index,
+            "".join([
+                f" [{segment['label']}]({segment['short_url']})"
+                for segment in citation_info.segments
+            ]),
         )
+        for citation_info in citations_list
+    ]
+    return apply_citation_markers(text, markers)
+
+
+def apply_citation_markers(text, markers):
+    """
+    把预先构建好的引用标记一次性拼接进文本
+    
+    Args:
+        text (str): 原始文本
+        markers: (end_index, start_index, 标记字符串, ...) 元组序列（列表），
+            例如 iter_citation_markers 生成的 CitationMarker；
+            已按位置严格升序时不再排序
+    
+    Returns:
+        str: 插入引用标记后的文本
+    """
+    if not markers or not text:
+        return text
+
+    # 对引用标记进行排序
+    # 1. 主要按end_index升序排列（从前往后处理）
+    # 2. 如果end_index相同，按start_index升序排列
+    # Gemini按文档顺序返回支撑信息，标记通常已经是升序，
+    # 先线性检查一遍，只有出现乱序（或位置完全相同）时才排序
+    sorted_markers = markers
+    prev_position = None
+    for marker in markers:
+        position = _MARKER_POSITION(marker)
+        if prev_position is not None and position <= prev_position:
+            # 先反转再做稳定排序，完全相同的位置保持与原先倒序插入一致的先后顺序
+            sorted_markers = sorted(reversed(markers), key=_MARKER_POSITION)
+            break
+        prev_position = position
 
-    return modified_text
+    # 收集文本片段和引用标记，最后只拼接一次
+    parts = []
+    prev_idx = 0
+    for end_idx, _, marker, *_ in sorted_markers:
+        # 上一个插入点到当前插入点（原始文本中的结束位置）之间的原始文本 + 引用标记
+        # end_index相同时文本片段为空，多个引用标记依次紧挨着
+        parts.append(text[prev_idx:end_idx])
+        parts.append(marker)
+        prev_idx = end_idx
+
+    # 最后一个插入点之后的剩余文本
+    parts.append(text[prev_idx:])
+    return "".join(parts)
 
 
 def get_citations(response, resolved_urls_map):
@@ -226,7 +294,7 @@ def get_citations(response, resolved_urls_map):
         resolved_urls_map: URL映射字典 {原始URL: 短URL}
         
     Returns:
-        list: 引用信息列表，每个元素包含：
+        list[Citation]: 引用信息列表，每个元素包含：
             - start_index: 引用文本的开始位置
             - end_index: 引用文本的结束位置  
             - segments: 来源信息列表
@@ -236,88 +304,143 @@ def get_citations(response, resolved_urls_map):
                 
     错误处理：
     - 如果响应结构不完整，返回空列表
-    - 如果某个来源信息缺失，跳过该来源
-    - 使用try-catch确保部分错误不影响整体处理
+    - 如果某个来源信息缺失或索引越界，跳过该来源
+    - 使用显式检查而不是异常处理，确保部分错误不影响整体处理
     
     使用场景：
-    - 在web_research节点中处理搜索结果
-    - 为生成的文本添加可追溯的来源信息
-    - 支持最终答案中的引用链接
+    - 需要查看引用结构的调用方（调试、测试）
+    - web_research节点使用融合后的 iter_citation_markers，不经过这里
     """
-    citations = []
+    return [
+        Citation(marker.start_index, marker.end_index, marker.segments)
+        for marker in iter_citation_markers(response, resolved_urls_map)
+    ]
 
+
+class Citation(NamedTuple):
+    """
+    一条引用信息：引用文本的位置和对应的来源
+    
+    使用NamedTuple而不是字典：字段固定、按位置存储，占用内存更小。
+    来源信息（segments中的元素）仍然是字典，因为它们会写入状态
+    （sources_gathered）并序列化后发送给前端。
+    """
+    
+    # 引用文本的开始位置
+    start_index: int
+    
+    # 引用文本的结束位置
+    end_index: int
+    
+    # 来源信息列表，每个元素包含 label / short_url / value
+    segments: list
+
+
+class CitationMarker(NamedTuple):
+    """
+    一条引用支撑对应的插入信息
+    
+    字段顺序与 apply_citation_markers 的排序键一致：(结束位置, 开始位置)
+    """
+    
+    # 引用文本在原始文本中的结束位置，也是标记的插入位置
+    end_index: int
+    
+    # 引用文本在原始文本中的开始位置
+    start_index: int
+    
+    # 拼接好的引用标记，如 " [来源标题](短URL) [来源标题2](短URL2)"
+    marker: str
+    
+    # 来源信息列表（label / short_url / value），用于汇总信息源
+    segments: list
+
+
+def iter_citation_markers(response, resolved_urls_map) -> Iterator[CitationMarker]:
+    """
+    逐条生成引用标记：解析grounding_metadata并直接构建标记字符串
+    
+    把"提取引用"和"构建标记"融合成一次遍历：读取每个来源时
+    同时生成它的markdown链接，不再先构建引用字典、插入时再遍历一遍。
+    解析规则与 get_citations 的说明一致。
+    
+    Args:
+        response: Gemini模型的完整响应对象
+        resolved_urls_map: URL映射字典 {原始URL: 短URL}
+        
+    Yields:
+        CitationMarker: 每条有效支撑信息对应的插入位置、标记和来源
+    """
     # 检查响应的基本结构
     if not response or not response.candidates:
-        return citations
+        return
 
     candidate = response.candidates[0]
     
     # 检查是否有grounding_metadata
-    if (
-        not hasattr(candidate, "grounding_metadata")
-        or not candidate.grounding_metadata
-        or not hasattr(candidate.grounding_metadata, "grounding_supports")
-    ):
-        return citations
+    # 用 getattr(..., None) 代替 hasattr + 属性访问，并把常用对象绑定为局部变量，
+    # 循环中不再重复查找 candidate.grounding_metadata.grounding_chunks
+    grounding_metadata = getattr(candidate, "grounding_metadata", None)
+    if not grounding_metadata:
+        return
+    supports = getattr(grounding_metadata, "grounding_supports", None)
+    if supports is None:
+        return
+    chunks = getattr(grounding_metadata, "grounding_chunks", None) or ()
+    chunk_count = len(chunks)
+    get_short_url = resolved_urls_map.get
 
     # 处理每个支撑信息
-    for support in candidate.grounding_metadata.grounding_supports:
-        citation = {}
-
+    for support in supports:
         # 检查段落信息是否存在
-        if not hasattr(support, "segment") or support.segment is None:
+        segment = getattr(support, "segment", None)
+        if segment is None:
             continue  # 跳过没有段落信息的支撑
 
-        # 提取位置信息
-        start_index = (
-            support.segment.start_index
-            if support.segment.start_index is not None
-            else 0
-        )
-
         # end_index是必需的，用于确定引用位置
-        if support.segment.end_index is None:
+        end_index = segment.end_index
+        if end_index is None:
             continue  # 跳过没有结束位置的支撑
 
-        # 设置引用的基本信息
-        citation["start_index"] = start_index
-        citation["end_index"] = support.segment.end_index
+        # 提取位置信息
+        start_index = segment.start_index
+        if start_index is None:
+            start_index = 0
 
         # 处理来源信息
-        citation["segments"] = []
-        if (
-            hasattr(support, "grounding_chunk_indices")
-            and support.grounding_chunk_indices
-        ):
-            # 遍历每个来源索引
-            for ind in support.grounding_chunk_indices:
-                try:
-                    # 获取来源详细信息
-                    chunk = candidate.grounding_metadata.grounding_chunks[ind]
-                    
-                    # 查找对应的短URL
-                    resolved_url = resolved_urls_map.get(chunk.web.uri, None)
-                    
-                    # 构建来源信息
-                    citation["segments"].append(
-                        {
-                            "label": chunk.web.title.split(".")[:-1][0],  # 提取主标题（去掉文件扩展名）
-                            "short_url": resolved_url,                    # 短URL
-                            "value": chunk.web.uri,                      # 原始URL
-                        }
-                    )
-                except (IndexError, AttributeError, NameError):
-                    # 处理各种可能的错误：
-                    # - IndexError: 索引超出范围
-                    # - AttributeError: 对象属性不存在
-                    # - NameError: 变量未定义
-                    # 
-                    # 在生产系统中，可以考虑记录这些错误用于调试
-                    pass
+        # 用显式的边界和None检查代替 try/except，跳过无效的来源索引
+        segments = []
+        marker_parts = []
+        append_segment = segments.append
+        append_marker = marker_parts.append
+        for ind in getattr(support, "grounding_chunk_indices", None) or ():
+            # 索引超出范围
+            if not 0 <= ind < chunk_count:
+                continue
+            
+            # 获取来源详细信息，没有网页信息的来源直接跳过
+            web = getattr(chunks[ind], "web", None)
+            if web is None:
+                continue
+            uri = web.uri
+            short_url = get_short_url(uri)
+            
+            # 提取主标题（去掉最后一个"."之后的扩展名）
+            # rpartition 只切分一次；标题中没有"."时直接使用完整标题
+            title = web.title or ""
+            label = title.rpartition(".")[0] or title
+            
+            # 构建来源信息，同时生成对应的markdown链接
+            append_segment(
+                {
+                    "label": label,            # 来源标题
+                    "short_url": short_url,    # 短URL
+                    "value": uri,              # 原始URL
+                }
+            )
+            append_marker(f" [{label}]({short_url})")
         
-        citations.append(citation)
-    
-    return citations
+        yield CitationMarker(end_index, start_index, "".join(marker_parts), segments)
 
 
 # ========== 工具函数设计说明 ==========
@@ -329,12 +452,12 @@ def get_citations(response, resolved_urls_map):
 #
 # 2. 错误处理：
 #    - 包含适当的边界条件检查
-#    - 使用try-catch处理预期的异常
+#    - 对外部数据做显式的边界和None检查，而不是依赖异常处理
 #    - 优雅降级：部分错误不影响整体功能
 #
 # 3. 性能考虑：
 #    - URL解析使用字典避免重复处理
-#    - 引用插入采用倒序避免索引错位
+#    - 引用插入基于原始位置一次拼接，避免索引错位和重复复制文本
 #    - 文本处理考虑大文档的处理效率
 #
 # 4. 类型安全：